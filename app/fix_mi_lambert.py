@@ -221,7 +221,8 @@ def fix_mi_lambert_mi(mi_filespec, overwrite_backup=False, dry_run=False):
 
 
 def fix_mi_lambert_folder(folder, method='ogr', overwrite_backup=False,
-								encoding='latin-1', dry_run=False, recursive=False):
+								encoding='latin-1', dry_run=False, recursive=False,
+								num_workers=1):
 	"""
 	Fix Belgian Lambert 1972 projection for all MapInfo files in a given folder
 
@@ -244,27 +245,40 @@ def fix_mi_lambert_folder(folder, method='ogr', overwrite_backup=False,
 	:param recursive:
 		bool, whether or not to include subfolders
 		(default: False)
+	:param num_workers:
+		int, number of processes used to fix files in parallel
+		(only for 'ogr' method). If None, the number of CPUs will be used
+		(default: 1)
 	"""
-	if recursive:
-		list_func = os.walk
-	else:
-		list_func = os.listdir
-
+	mi_filespecs = []
 	for (dirpath, dirnames, filenames) in os.walk(folder):
 		for filename in filenames:
 			if (os.path.splitext(filename)[-1].upper() == ".TAB"
 				and not "old lambert72" in filename):
-				mi_filespec = os.path.join(dirpath, filename)
-				if method == 'ogr':
-					fix_mi_lambert_ogr(mi_filespec, overwrite_backup=overwrite_backup,
-										encoding=encoding, dry_run=dry_run)
-				elif method == 'mi':
-					fix_mi_lambert_mi(mi_filespec, overwrite_backup=overwrite_backup,
-										dry_run=dry_run)
+				mi_filespecs.append(os.path.join(dirpath, filename))
 
 		if not recursive:
 			break
 
+	if method == 'ogr' and num_workers != 1:
+		## Files are independent, so they can be fixed in separate processes
+		from concurrent.futures import ProcessPoolExecutor
+		from functools import partial
+
+		fix_func = partial(fix_mi_lambert_ogr, overwrite_backup=overwrite_backup,
+							encoding=encoding, dry_run=dry_run)
+		with ProcessPoolExecutor(max_workers=num_workers) as executor:
+			list(executor.map(fix_func, mi_filespecs))
+		return
+
+	for mi_filespec in mi_filespecs:
+		if method == 'ogr':
+			fix_mi_lambert_ogr(mi_filespec, overwrite_backup=overwrite_backup,
+								encoding=encoding, dry_run=dry_run)
+		elif method == 'mi':
+			fix_mi_lambert_mi(mi_filespec, overwrite_backup=overwrite_backup,
+								dry_run=dry_run)
+
 
 
 if __name__ == "__main__":
@@ -13,18 +13,39 @@ except:
 
 
 import os
+import math
+import threading
 import numpy as np
-import ogr
 import osr
 
 
 
+def _set_traditional_axis_order(srs):
+	"""
+	Let coordinates be passed in traditional GIS order, i.e. lon/lat
+	or easting/northing, regardless of the axis order defined by the
+	authority (GDAL >= 3 follows the authority order by default,
+	e.g. lat/lon for EPSG:4326)
+
+	:param srs:
+		osr SpatialReference object, modified in place
+
+	:return:
+		srs
+	"""
+	if hasattr(srs, 'SetAxisMappingStrategy'):
+		srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+	return srs
+
+
 ## Some useful spatial reference systems
+## Note: all use traditional axis order, as assumed by the functions below
 
 ## WGS84
 WGS84 = osr.SpatialReference()
 WGS84_EPSG = 4326
 WGS84.ImportFromEPSG(WGS84_EPSG)
+_set_traditional_axis_order(WGS84)
 
 ## Lambert 1972
 ## WKT corresponding to MapInfo specification
@@ -47,11 +68,13 @@ LAMBERT1972 = osr.SpatialReference()
 ## (less than 10 cm difference with SRS based on WKT)
 LAMBERT1972_EPSG = 6190
 LAMBERT1972.ImportFromEPSG(LAMBERT1972_EPSG)
+_set_traditional_axis_order(LAMBERT1972)
 
 ## Google Pseudo-Mercator
 GGL_MERCATOR = osr.SpatialReference()
 GGL_MERCATOR_EPSG = 3857
 GGL_MERCATOR.ImportFromEPSG(GGL_MERCATOR_EPSG)
+_set_traditional_axis_order(GGL_MERCATOR)
 
 ## ECEF: Earth centred, earth fixed, righthanded 3D coordinate system
 ECEF_WKT = """
@@ -72,6 +95,13 @@ ECEF_WKT = """
 ECEF_EPSG = 4978
 ECEF = osr.SpatialReference()
 ECEF.ImportFromEPSG(ECEF_EPSG)
+_set_traditional_axis_order(ECEF)
+
+## Cache of coordinate transformations, keyed by source and target SRS
+## (see :func:`_get_srs_key`)
+## Note: separate cache for each thread, as transformation objects
+## should not be shared between threads
+_coord_trans_cache = threading.local()
 
 
 def get_epsg_srs(epsg_code):
@@ -82,7 +112,8 @@ def get_epsg_srs(epsg_code):
 		str or int, EPSG code (e.g., "EPSG:3857", "3857" or 3857)
 
 	:return:
-		Instance of :class:`osr.SpatialReference`
+		Instance of :class:`osr.SpatialReference`,
+		with traditional (lon/lat or easting/northing) axis order
 	"""
 	if isinstance(epsg_code, basestring):
 		if epsg_code[:5] == "EPSG:":
@@ -90,7 +121,7 @@ def get_epsg_srs(epsg_code):
 		epsg_code = int(epsg_code)
 	srs = osr.SpatialReference()
 	srs.ImportFromEPSG(epsg_code)
-	return srs
+	return _set_traditional_axis_order(srs)
 
 
 def get_utm_spec(lon, lat):
@@ -140,7 +171,130 @@ def get_utm_srs(utm_spec="UTM31N"):
 	#utm.SetWellKnownGeogCS("WGS84")
 	utm.ImportFromEPSG(WGS84_EPSG)
 	utm.SetUTM(utm_zone, {"N": True, "S": False}[utm_hemisphere])
-	return utm
+	return _set_traditional_axis_order(utm)
+
+
+def _has_traditional_axis_order(srs):
+	"""
+	Determine whether coordinates are passed to OSR in traditional
+	GIS order (lon/lat or easting/northing) for a spatial reference
+	system (see :func:`_set_traditional_axis_order`)
+
+	:param srs:
+		osr SpatialReference object
+
+	:return:
+		bool
+	"""
+	if not hasattr(srs, 'GetDataAxisToSRSAxisMapping'):
+		## GDAL < 3
+		return True
+	traditional_srs = _set_traditional_axis_order(srs.Clone())
+	return (list(srs.GetDataAxisToSRSAxisMapping())
+			== list(traditional_srs.GetDataAxisToSRSAxisMapping()))
+
+
+def _get_srs_key(srs):
+	"""
+	Get key identifying a spatial reference system in the cache of
+	coordinate transformations. In addition to the WKT, this includes
+	the data axis to SRS axis mapping (GDAL >= 3) and the coordinate
+	epoch (GDAL >= 3.4), which are not part of the WKT, but affect
+	the transformation. Cached transformations thus do not depend on
+	which SRS objects were used earlier
+
+	:param srs:
+		osr SpatialReference object
+
+	:return:
+		tuple
+	"""
+	key = (srs.ExportToWkt(),)
+	if hasattr(srs, 'GetDataAxisToSRSAxisMapping'):
+		key += (tuple(srs.GetDataAxisToSRSAxisMapping()),)
+	if hasattr(srs, 'GetCoordinateEpoch'):
+		key += (srs.GetCoordinateEpoch(),)
+	return key
+
+
+def get_coordinate_transformation(source_srs, target_srs):
+	"""
+	Get coordinate transformation between two spatial reference systems.
+	Transformations are cached, so that the transformation pipeline is
+	set up only once for a given combination of source and target SRS
+	(in each thread)
+
+	:param source_srs:
+		osr SpatialReference object: source coordinate system
+	:param target_srs:
+		osr SpatialReference object: target coordinate system
+
+	:return:
+		instance of :class:`osr.CoordinateTransformation`
+	"""
+	try:
+		cache = _coord_trans_cache.transformations
+	except AttributeError:
+		cache = _coord_trans_cache.transformations = {}
+
+	key = (_get_srs_key(source_srs), _get_srs_key(target_srs))
+	try:
+		ct = cache[key]
+	except KeyError:
+		ct = osr.CoordinateTransformation(source_srs, target_srs)
+		cache[key] = ct
+	return ct
+
+
+def get_pyproj_transformer(source_srs, target_srs):
+	"""
+	Get pyproj transformer between two spatial reference systems,
+	for vectorized transformation of coordinate arrays.
+	Transformers are cached in the same way as in
+	:func:`get_coordinate_transformation`.
+	Requires the pyproj package
+
+	:param source_srs:
+		osr SpatialReference object: source coordinate system
+	:param target_srs:
+		osr SpatialReference object: target coordinate system
+
+	:return:
+		instance of :class:`pyproj.Transformer` (with traditional
+		x/y or lon/lat axis order), or None if pyproj is not available,
+		if one of the SRSs has a coordinate epoch, or if one of the SRSs
+		does not use traditional axis order (in which case the result
+		would differ from the corresponding OSR transformation)
+	"""
+	try:
+		import pyproj
+	except ImportError:
+		return None
+
+	## Coordinate epoch is lost in WKT export
+	for srs in (source_srs, target_srs):
+		if hasattr(srs, 'GetCoordinateEpoch') and srs.GetCoordinateEpoch():
+			return None
+
+	try:
+		cache = _coord_trans_cache.transformers
+	except AttributeError:
+		cache = _coord_trans_cache.transformers = {}
+
+	key = (_get_srs_key(source_srs), _get_srs_key(target_srs))
+	try:
+		transformer = cache[key]
+	except KeyError:
+		if (_has_traditional_axis_order(source_srs)
+			and _has_traditional_axis_order(target_srs)):
+			source_crs = pyproj.CRS.from_wkt(key[0][0])
+			target_crs = pyproj.CRS.from_wkt(key[1][0])
+			transformer = pyproj.Transformer.from_crs(source_crs, target_crs,
+													always_xy=True)
+		else:
+			transformer = None
+		cache[key] = transformer
+	return transformer
 
 
 def transform_point(source_srs, target_srs, x, y, z=None):
@@ -161,7 +315,7 @@ def transform_point(source_srs, target_srs, x, y, z=None):
 	:return:
 		(x, y, [z]) tuple of transformed coordinates
 	"""
-	ct = osr.CoordinateTransformation(source_srs, target_srs)
+	ct = get_coordinate_transformation(source_srs, target_srs)
 
 	if z is None:
 		return ct.TransformPoint(x, y)[:2]
@@ -183,29 +337,18 @@ def transform_coordinates(source_srs, target_srs, coord_list):
 	:return:
 		list of transformed coordinates (tuples)
 	"""
-	ct = osr.CoordinateTransformation(source_srs, target_srs)
+	ct = get_coordinate_transformation(source_srs, target_srs)
 
-	line = ogr.Geometry(ogr.wkbLineString)
-	line.AssignSpatialReference(source_srs)
 	has_elevation = False
 	if len(coord_list[0]) > 2:
 		has_elevation = True
-	for coord in coord_list:
-		x, y = coord[:2]
-		if has_elevation:
-			z = coord[2]
-			line.AddPoint(x, y, z)
-		else:
-			line.AddPoint(x, y)
-	line.Transform(ct)
-	out_coord_list = []
-	for i in range(line.GetPointCount()):
-		if has_elevation:
-			out_coord_list.append((line.GetX(i), line.GetY(i), line.GetZ(i)))
-		else:
-			out_coord_list.append((line.GetX(i), line.GetY(i)))
-	line.Empty()
-	return out_coord_list
+	num_dims = 3 if has_elevation else 2
+
+	## Transform all coordinates at once from array
+	## (rather than adding them one by one to a linestring)
+	xyz_source = np.asarray(coord_list, dtype=np.float64)[:,:num_dims]
+	xyz_target = ct.TransformPoints(xyz_source)
+	return [tuple(coord[:num_dims]) for coord in xyz_target]
 
 
 def gen_transform_coordinates(source_srs, target_srs, coord_list):
@@ -224,7 +367,7 @@ def gen_transform_coordinates(source_srs, target_srs, coord_list):
 		Generator yielding (x, y, [z]) tuple of transformed coordinates
 	"""
 
-	ct = osr.CoordinateTransformation(source_srs, target_srs)
+	ct = get_coordinate_transformation(source_srs, target_srs)
 	has_elevation = False
 	if len(coord_list[0]) > 2:
 		has_elevation = True
@@ -259,7 +402,15 @@ def transform_array_coordinates(source_srs, target_srs, X, Y, Z=None):
 	:return:
 		(x, y, [z]) tuple of 1-D float arrays: output coordinate arrays
 	"""
-	ct = osr.CoordinateTransformation(source_srs, target_srs)
+	if Z is None or len(Z) == 0:
+		## Vectorized transformation with pyproj if available,
+		## returning arrays directly rather than a list of tuples
+		transformer = get_pyproj_transformer(source_srs, target_srs)
+		if transformer is not None:
+			return transformer.transform(np.asarray(X, dtype=np.float64),
+										np.asarray(Y, dtype=np.float64))
+
+	ct = get_coordinate_transformation(source_srs, target_srs)
 
 	if Z is None or len(Z) == 0:
 		has_elevation = False
@@ -296,7 +447,7 @@ def transform_mesh_coordinates(source_srs, target_srs, XX, YY):
 		(xx, yy) tuple of 2-D float arrays: output coordinate arrays
 		representing x and y coordinates of a meshed grid
 	"""
-	ct = osr.CoordinateTransformation(source_srs, target_srs)
+	ct = get_coordinate_transformation(source_srs, target_srs)
 
 	## the ct object takes and returns pairs of x,y, not 2d grids
 	## so the the grid needs to be reshaped (flattened) and back.
@@ -314,6 +465,126 @@ def transform_mesh_coordinates(source_srs, target_srs, XX, YY):
 	return xx, yy
 
 
+## Constants for compiled WGS84 to Lambert 1972 transformation
+## WGS84 ellipsoid
+_WGS84_A = 6378137.
+_WGS84_E2 = (2 - 1. / 298.257223563) / 298.257223563
+## International 1924 ellipsoid (Belge 1972 datum)
+_INTL_A = 6378388.
+_INTL_E2 = (2 - 1. / 297) / 297
+_INTL_E = math.sqrt(_INTL_E2)
+## Belge 1972 to WGS84 (EPSG:15929, coordinate frame rotation)
+## Translations in m, rotations in radians, scale difference
+_BD72_TX, _BD72_TY, _BD72_TZ = -106.8686, 52.2978, -103.7239
+_BD72_RX, _BD72_RY, _BD72_RZ = [math.radians(r / 3600.)
+								for r in (-0.3366, 0.457, -1.8422)]
+_BD72_DS = -1.2747E-6
+## Lambert Conformal Conic (2SP) projection parameters (EPSG:31370)
+_LCC_LON0 = math.radians(4.367486666666667)
+_LCC_X0, _LCC_Y0 = 150000.013, 5400088.438
+
+
+def _get_lcc_constants():
+	"""
+	Compute constants n and a*F of Lambert Conformal Conic projection
+	with latitude of origin at the pole (EPSG:31370)
+	"""
+	def m(lat):
+		return math.cos(lat) / math.sqrt(1 - _INTL_E2 * math.sin(lat)**2)
+	def t(lat):
+		sin_lat = _INTL_E * math.sin(lat)
+		return (math.tan(math.pi / 4 - lat / 2)
+				/ ((1 - sin_lat) / (1 + sin_lat))**(_INTL_E / 2))
+	lat1, lat2 = math.radians(51.16666723333333), math.radians(49.8333339)
+	n = ((math.log(m(lat1)) - math.log(m(lat2)))
+		/ (math.log(t(lat1)) - math.log(t(lat2))))
+	aF = _INTL_A * m(lat1) / (n * t(lat1)**n)
+	return n, aF
+
+
+_LCC_N, _LCC_AF = _get_lcc_constants()
+
+
+def _lonlat_to_lambert1972_kernel(lons, lats, x, y):
+	"""
+	Transform WGS84 coordinates to Lambert 1972 (EPSG:31370), filling
+	preallocated output arrays. Compiled with numba if available,
+	see :func:`_get_lambert1972_kernel`
+
+	:param lons:
+		1-D float array, longitudes (in degrees)
+	:param lats:
+		1-D float array, latitudes (in degrees)
+	:param x:
+		1-D float array, output eastings (in m)
+	:param y:
+		1-D float array, output northings (in m)
+	"""
+	for i in prange(len(lons)):
+		lon, lat = math.radians(lons[i]), math.radians(lats[i])
+
+		## Geocentric coordinates on WGS84 ellipsoid (at zero height)
+		sin_lat, cos_lat = math.sin(lat), math.cos(lat)
+		N = _WGS84_A / math.sqrt(1 - _WGS84_E2 * sin_lat * sin_lat)
+		X = N * cos_lat * math.cos(lon) - _BD72_TX
+		Y = N * cos_lat * math.sin(lon) - _BD72_TY
+		Z = N * (1 - _WGS84_E2) * sin_lat - _BD72_TZ
+
+		## Inverse Helmert transformation to Belge 1972 datum
+		## (transpose of coordinate frame rotation matrix)
+		scale = 1. / (1 + _BD72_DS)
+		X, Y, Z = ((X - _BD72_RZ * Y + _BD72_RY * Z) * scale,
+					(_BD72_RZ * X + Y - _BD72_RX * Z) * scale,
+					(-_BD72_RY * X + _BD72_RX * Y + Z) * scale)
+
+		## Geodetic coordinates on International 1924 ellipsoid
+		p = math.sqrt(X * X + Y * Y)
+		lon = math.atan2(Y, X)
+		lat = math.atan2(Z, p * (1 - _INTL_E2))
+		for _ in range(4):
+			sin_lat = math.sin(lat)
+			N = _INTL_A / math.sqrt(1 - _INTL_E2 * sin_lat * sin_lat)
+			h = p / math.cos(lat) - N
+			lat = math.atan2(Z, p * (1 - _INTL_E2 * N / (N + h)))
+
+		## Lambert Conformal Conic projection
+		e_sin_lat = _INTL_E * math.sin(lat)
+		t = (math.tan(math.pi / 4 - lat / 2)
+			/ ((1 - e_sin_lat) / (1 + e_sin_lat))**(_INTL_E / 2))
+		r = _LCC_AF * t**_LCC_N
+		theta = _LCC_N * (lon - _LCC_LON0)
+		x[i] = _LCC_X0 + r * math.sin(theta)
+		y[i] = _LCC_Y0 - r * math.cos(theta)
+
+
+## Compiled version of :func:`_lonlat_to_lambert1972_kernel`
+## (False if numba is not available, None if not compiled yet)
+_lambert1972_kernel = None
+## Replaced with numba.prange when kernel is compiled
+prange = range
+
+
+def _get_lambert1972_kernel():
+	"""
+	Import numba and compile :func:`_lonlat_to_lambert1972_kernel`
+	on first use (importing numba is slow)
+
+	:return:
+		compiled function, or False if numba is not available
+	"""
+	global _lambert1972_kernel, prange
+	if _lambert1972_kernel is None:
+		try:
+			import numba
+		except ImportError:
+			_lambert1972_kernel = False
+		else:
+			prange = numba.prange
+			_lambert1972_kernel = numba.njit(cache=True, parallel=True)(
+											_lonlat_to_lambert1972_kernel)
+	return _lambert1972_kernel
+
+
 def lonlat_to_lambert1972(lons, lats=None, z=None):
 	"""
 	Convert geographic coordinates (WGS84) to Lambert 1972
@@ -336,6 +607,16 @@ def lonlat_to_lambert1972(lons, lats=None, z=None):
 		coords = lons
 		return transform_coordinates(WGS84, LAMBERT1972, coords)
 	else:
+		if ((z is None or len(z) == 0)
+			and get_pyproj_transformer(WGS84, LAMBERT1972) is None):
+			## Compiled transformation if pyproj is not available
+			kernel = _get_lambert1972_kernel()
+			if kernel:
+				lons = np.ascontiguousarray(lons, dtype=np.float64)
+				lats = np.ascontiguousarray(lats, dtype=np.float64)
+				X, Y = np.empty_like(lons), np.empty_like(lats)
+				kernel(lons, lats, X, Y)
+				return X, Y
 		return transform_array_coordinates(WGS84, LAMBERT1972, lons, lats, z)
 
 
@@ -58,6 +58,74 @@ def spherical_distance(lon1, lat1, lon2, lat2):
 	return d * 1000.
 
 
+class SphericalOrigin:
+	"""
+	Origin point for repeated spherical distance/azimuth calculations,
+	caching its coordinates in radians and the sine and cosine of
+	its latitude
+
+	:param lon:
+		float, longitude in decimal degrees
+	:param lat:
+		float, latitude in decimal degrees
+	"""
+	def __init__(self, lon, lat):
+		self.lon = lon
+		self.lat = lat
+		self.lon_r = np.radians(lon)
+		self.lat_r = np.radians(lat)
+		self.sin_lat, self.cos_lat = np.sin(self.lat_r), np.cos(self.lat_r)
+
+
+def distances_from(origin, lons2, lats2):
+	"""
+	Compute distance between origin and other point(s) using the
+	haversine formula
+
+	:param origin:
+		instance of :class:`SphericalOrigin`
+	:param lons2:
+		float or numpy array, longitude(s) of point(s) B in decimal degrees
+	:param lats2:
+		float or numpy array, latitude(s) of point(s) B in decimal degrees
+
+	:return:
+		float or numpy array, distance in m
+	"""
+	lon2, lat2 = np.radians(lons2), np.radians(lats2)
+	dlat = lat2 - origin.lat_r
+	dlon = lon2 - origin.lon_r
+	a = np.sin(dlat/2.)**2 + (origin.cos_lat * np.cos(lat2) * np.sin(dlon/2.)**2)
+	c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+	d = EARTH_RADIUS * c
+	return d * 1000.
+
+
+def azimuths_from(origin, lons2, lats2):
+	"""
+	Compute compass bearing between origin and other point(s)
+
+	:param origin:
+		instance of :class:`SphericalOrigin`
+	:param lons2:
+		float or numpy array, longitude(s) of point(s) B in decimal degrees
+	:param lats2:
+		float or numpy array, latitude(s) of point(s) B in decimal degrees
+
+	:return:
+		float or numpy array, compass bearing in degrees
+	"""
+	lat2 = np.radians(lats2)
+	dlon = np.radians(lons2) - origin.lon_r
+	cos_lat2 = np.cos(lat2)
+
+	x = np.sin(dlon) * cos_lat2
+	y = origin.cos_lat * np.sin(lat2) - (origin.sin_lat * cos_lat2 * np.cos(dlon))
+	initial_bearing = np.degrees(np.arctan2(x, y))
+	compass_bearing = (initial_bearing + 360) % 360
+	return compass_bearing
+
+
 def meshed_spherical_distance(lons1, lats1, lons2, lats2):
 	"""
 	Meshed spherical distance computation: compute distance between
@@ -201,14 +269,17 @@ def spherical_point_at(lon1, lat1, distance, azimuth):
 		tuple (lon2, lat2) of floats or numpy arrays containing
 		longitude(s) and latitude(s) of point(s)
 	"""
+	## Great-circle destination formulas, see Williams' Aviation Formulary:
+	## http://www.edwilliams.org/avform.htm#LL
 	lon1, lat1 = np.radians(lon1), np.radians(lat1)
 	azimuth = np.radians(azimuth)
-	half_pi = np.pi / 2
 
 	b = distance / (EARTH_RADIUS * 1000)
-	sin_b = np.sin(b)
-	a = np.arccos(np.cos(b) * np.cos(half_pi-lat1) + np.sin(half_pi-lat1) * sin_b * np.cos(azimuth))
-	B = np.arcsin(sin_b * np.sin(azimuth) / np.sin(a))
-	lat2 = 90 - np.degrees(a)
-	lon2 = np.degrees(lon1 + B)
+	sin_b, cos_b = np.sin(b), np.cos(b)
+	sin_lat1, cos_lat1 = np.sin(lat1), np.cos(lat1)
+	lat2 = np.arcsin(sin_lat1 * cos_b + cos_lat1 * sin_b * np.cos(azimuth))
+	dlon = np.arctan2(np.sin(azimuth) * sin_b * cos_lat1,
+						cos_b - sin_lat1 * np.sin(lat2))
+	lon2 = np.degrees(lon1 + dlon)
+	lat2 = np.degrees(lat2)
 	return (lon2, lat2)
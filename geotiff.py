@@ -14,9 +14,35 @@ import gdal, osr
 gdal.UseExceptions()
 
 
+## GDAL data types corresponding to supported numpy data types
+GDAL_DTYPES = {'float32': gdal.GDT_Float32,
+				'int16': gdal.GDT_Int16,
+				'uint8': gdal.GDT_Byte}
+
+
+def _get_srs_wkt(srs):
+	"""
+	Get WKT representation of spatial reference system
+
+	:param srs:
+		instance of class:`osr.SpatialReferenceSystem` or str: spatial
+		reference system or WKT representation
+
+	:return:
+		str, WKT representation
+	"""
+	## Note: WKT is not cached, as SRS objects are mutable
+	try:
+		return srs.ExportToWkt()
+	except AttributeError:
+		## Already WKT
+		return srs
+
+
 def write_single_band_geotiff(out_filespec, data, extent, srs,
 				cell_registration="center", north_up=False,
-				nodata_value=np.nan, compression='LZW'):
+				nodata_value=np.nan, compression='LZW', dtype='float32',
+				scale_factor=1., add_offset=0., compute_stats=False):
 	"""
 	Write data array to single-band GeoTiff
 
@@ -38,16 +64,66 @@ def write_single_band_geotiff(out_filespec, data, extent, srs,
 		(i.e., going from xmax to xmin)
 		(default: False)
 	:param nodata_value:
-		float, value to use for "no data"
+		float, value to use for "no data". For integer data types,
+		it should be outside the range of the quantized data values
+		(preferably the minimum or maximum of the data type range,
+		which are then excluded from the quantized data)
 		(default: np.nan)
 	:param compression:
 		str, GDAL option to compress TIF files
 		(default: 'LZW')
+	:param dtype:
+		str, data type of raster, one of 'float32', 'int16' or 'uint8'.
+		Integer types require less storage, data values are quantized
+		using :param:`scale_factor` and :param:`add_offset`
+		(default: 'float32')
+	:param scale_factor:
+		float, scale factor for quantization to integer data type
+		(default: 1.)
+	:param add_offset:
+		float, offset for quantization to integer data type
+		Data values are recovered as stored_value * scale_factor + add_offset
+		(default: 0.)
+	:param compute_stats:
+		bool, whether or not to compute band statistics and store them
+		in the GeoTiff. This requires an additional pass over the data
+		(default: False)
 	"""
-	## Order of rows should be north to south, otherwise image is upside down
-	if not north_up:
-		data = data[::-1,:]
 	ny, nx = data.shape
+	dtype = np.dtype(dtype)
+	gdal_dtype = GDAL_DTYPES[dtype.name]
+
+	if dtype.kind in ('i', 'u'):
+		## Quantize data, using minimum (signed) or maximum (unsigned)
+		## of data type range as "no data" value if none is specified
+		dtype_info = np.iinfo(dtype)
+		if nodata_value is None or np.isnan(nodata_value):
+			if dtype.kind == 'i':
+				nodata_value = dtype_info.min
+				qmin, qmax = dtype_info.min + 1, dtype_info.max
+			else:
+				nodata_value = dtype_info.max
+				qmin, qmax = dtype_info.min, dtype_info.max - 1
+		else:
+			## Exclude "no data" value from range of quantized data
+			qmin, qmax = dtype_info.min, dtype_info.max
+			if nodata_value == qmin:
+				qmin += 1
+			elif nodata_value == qmax:
+				qmax -= 1
+		nodata_mask = np.isnan(data)
+		qdata = np.round((data - add_offset) / scale_factor)
+		np.clip(qdata, qmin, qmax, out=qdata)
+		if qmin <= nodata_value <= qmax and not nodata_mask.all():
+			valid_qdata = qdata[~nodata_mask]
+			if valid_qdata.min() <= nodata_value <= valid_qdata.max():
+				raise ValueError("nodata_value %s lies inside range of quantized "
+								"data, choose a value outside this range (e.g., "
+								"minimum or maximum of %s)" % (nodata_value, dtype.name))
+		qdata[nodata_mask] = nodata_value
+		data = qdata.astype(dtype)
+	else:
+		data = data.astype(dtype, copy=False)
 
 	## GDAL needs grid corner coordinates
 	xmin, xmax, ymin, ymax = extent
@@ -55,6 +131,7 @@ def write_single_band_geotiff(out_filespec, data, extent, srs,
 		dx = (xmax - xmin) / (float(nx) - 1)
 		xmin -= dx/2.
 		dy = (ymax - ymin) / (float(ny) - 1)
+		ymin -= dy/2.
 		ymax += dy/2.
 	elif cell_registration == "corner":
 		dx = (xmax - xmin) / float(nx)
@@ -63,24 +140,29 @@ def write_single_band_geotiff(out_filespec, data, extent, srs,
 	driver = gdal.GetDriverByName("Gtiff")
 	if compression:
 		ds_options = ['COMPRESS=%s' % compression.upper()]
-	ds = driver.Create(out_filespec, nx, ny, 1, gdal.GDT_Float32, options=ds_options)
+	ds = driver.Create(out_filespec, nx, ny, 1, gdal_dtype, options=ds_options)
 
 	## Affine transform takes 6 parameters:
 	## top left x, cell size x, rotation, top left y, rotation, cell size y
 	## Note that x, y coordinates refer to top left corner of top left pixel!
 	## For north-up images, rotation coefficients are zero
-	tf = (xmin, dx, 0, ymax, 0, -dy)
+	## If rows are ordered south to north, we use a positive cell size y
+	## and the bottom edge as origin, rather than flipping the array
+	if north_up:
+		tf = (xmin, dx, 0, ymax, 0, -dy)
+	else:
+		tf = (xmin, dx, 0, ymin, 0, dy)
 	ds.SetGeoTransform(tf)
-	try:
-		srs_wkt = srs.ExportToWkt()
-	except:
-		srs_wkt = srs
-	ds.SetProjection(srs_wkt)
+	ds.SetProjection(_get_srs_wkt(srs))
 
 	band = ds.GetRasterBand(1)
-	band.WriteArray(data.astype(np.float32))
+	band.WriteArray(data)
 	band.SetNoDataValue(nodata_value)
-	band.ComputeStatistics()
+	if dtype.kind in ('i', 'u'):
+		band.SetScale(scale_factor)
+		band.SetOffset(add_offset)
+	if compute_stats:
+		band.ComputeStatistics(False)
 	ds.FlushCache()
 	ds = None
 
@@ -118,41 +200,50 @@ def write_multi_band_geotiff(out_filespec, img, extent, srs,
 		img_ar = img
 	ny, nx, num_bands = img_ar.shape
 
-	## Order of rows should be north to south, otherwise image is upside down
-	if not north_up:
-		img_ar = img_ar[::-1,:,:]
-
 	## GDAL needs grid corner coordinates
 	xmin, xmax, ymin, ymax = extent
 	if cell_registration == "center":
 		dx = (xmax - xmin) / (float(nx) - 1)
 		xmin -= dx/2.
 		dy = (ymax - ymin) / (float(ny) - 1)
+		ymin -= dy/2.
 		ymax += dy/2.
 	elif cell_registration == "corner":
 		dx = (xmax - xmin) / float(nx)
 		dy = (ymax - ymin) / float(ny)
 
 	driver = gdal.GetDriverByName("Gtiff")
+	ds_options = ['INTERLEAVE=PIXEL']
 	if compression:
-		ds_options = ['COMPRESS=%s' % compression.upper()]
+		ds_options.append('COMPRESS=%s' % compression.upper())
 	ds = driver.Create(out_filespec, nx, ny, num_bands, gdal.GDT_Byte, options=ds_options)
 
 	## Affine transform takes 6 parameters:
 	## top left x, cell size x, rotation, top left y, rotation, cell size y
 	## Note that x, y coordinates refer to top left corner of top left pixel!
 	## For north-up images, rotation coefficients are zero
-	tf = (xmin, dx, 0, ymax, 0, -dy)
+	## If rows are ordered south to north, we use a positive cell size y
+	## and the bottom edge as origin, rather than flipping the array
+	if north_up:
+		tf = (xmin, dx, 0, ymax, 0, -dy)
+	else:
+		tf = (xmin, dx, 0, ymin, 0, dy)
 	ds.SetGeoTransform(tf)
-	try:
-		srs_wkt = srs.ExportToWkt()
-	except:
-		srs_wkt = srs
-	ds.SetProjection(srs_wkt)
-
-	for i in range(num_bands):
-		band = ds.GetRasterBand(i+1)
-		band.WriteArray(img_ar[:,:,i])
+	ds.SetProjection(_get_srs_wkt(srs))
+
+	## Write all bands at once from pixel-interleaved (y, x, band) buffer
+	if img_ar.dtype != np.uint8:
+		## Saturate values outside byte range, as GDAL does when writing
+		## to a Byte band (casting would wrap them around)
+		if img_ar.dtype.kind == 'f':
+			img_ar = np.round(img_ar)
+		img_ar = np.clip(img_ar, 0, 255).astype(np.uint8)
+	## Note: array is passed as buffer directly, without copying to bytes
+	img_ar = np.ascontiguousarray(img_ar)
+	ds.WriteRaster(0, 0, nx, ny, img_ar, buf_xsize=nx, buf_ysize=ny,
+					buf_type=gdal.GDT_Byte, band_list=list(range(1, num_bands+1)),
+					buf_pixel_space=num_bands, buf_line_space=nx*num_bands,
+					buf_band_space=1)
 	ds.FlushCache()
 	ds = None
 
@@ -5,13 +5,287 @@ Select points in polygon
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 
-from osgeo import ogr
+import struct
 
+import numpy as np
 
-__all__ = ['filter_points_by_polygon']
+## Note: osgeo and numba are imported on first use, as importing them
+## is slow and not needed by callers that only import this module
 
+## numba module, False if not available, or None if not imported yet
+_numba = None
+## Replaced with numba.prange when numba is imported
+prange = range
 
-def filter_points_by_polygon(longitudes, latitudes, poly_obj):
+
+__all__ = ['build_point_index', 'filter_points_by_polygon',
+			'filter_collection_by_polygon', 'locate_points_in_polygons']
+
+
+## Layout of (2-D, little-endian) points in WKB multipoint
+_WKB_POINT_DTYPE = np.dtype([('byte_order', 'u1'), ('geom_type', '<u4'),
+							('x', '<f8'), ('y', '<f8')])
+
+
+def _pip_mask(lon, lat, rx, ry):
+	"""
+	Crossing-number test for points inside a polygon consisting of
+	a single ring. Compiled with numba if available
+
+	:param lon:
+		1-D float array, longitudes of points (in degrees)
+	:param lat:
+		1-D float array, latitudes of points (in degrees)
+	:param rx:
+		1-D float array, longitudes of ring vertices (in degrees)
+	:param ry:
+		1-D float array, latitudes of ring vertices (in degrees)
+
+	:return:
+		1-D bool array
+	"""
+	num_vertices = len(rx)
+	mask = np.zeros(len(lon), dtype=np.bool_)
+	for i in prange(len(lon)):
+		x, y = lon[i], lat[i]
+		inside = False
+		j = num_vertices - 1
+		for k in range(num_vertices):
+			if ((ry[k] > y) != (ry[j] > y)
+				and x < (rx[j] - rx[k]) * (y - ry[k]) / (ry[j] - ry[k]) + rx[k]):
+				inside = not inside
+			j = k
+		mask[i] = inside
+	return mask
+
+
+def _get_numba():
+	"""
+	Import numba on first use, and compile :func:`_pip_mask`
+
+	:return:
+		numba module, or False if numba is not available
+	"""
+	global _numba, prange, _pip_mask
+	if _numba is None:
+		try:
+			import numba
+		except ImportError:
+			_numba = False
+		else:
+			prange = numba.prange
+			_pip_mask = numba.njit(cache=True, parallel=True, fastmath=True)(_pip_mask)
+			_numba = numba
+	return _numba
+
+
+def build_point_index(longitudes, latitudes):
+	"""
+	Build R-tree spatial index of a point collection, to speed up
+	filtering the same points by many (small) polygons.
+	Requires the rtree package
+
+	:param longitudes:
+		array-like, longitudes (in degrees)
+	:param latitudes:
+		array-like, latitudes (in degrees)
+
+	:return:
+		instance of :class:`rtree.index.Index`, with point indexes as ids
+	"""
+	from rtree import index
+
+	## Note: bulk loading fails for empty data stream
+	if not len(longitudes):
+		return index.Index()
+
+	## Note: bulk loading from generator is faster than inserting points
+	return index.Index((idx, (lon, lat, lon, lat), None)
+						for idx, (lon, lat) in enumerate(zip(longitudes, latitudes)))
+
+
+def _get_multipoint_wkb(lons, lats):
+	"""
+	Construct WKB representation of multipoint
+
+	:param lons:
+		1-D float array, longitudes (in degrees)
+	:param lats:
+		1-D float array, latitudes (in degrees)
+
+	:return:
+		bytes
+	"""
+	from osgeo import ogr
+
+	num_points = len(lons)
+	header = struct.pack('<BII', 1, ogr.wkbMultiPoint, num_points)
+	points = np.empty(num_points, dtype=_WKB_POINT_DTYPE)
+	points['byte_order'] = 1
+	points['geom_type'] = ogr.wkbPoint
+	points['x'] = lons
+	points['y'] = lats
+	return header + points.tobytes()
+
+
+def _get_point_geometry_mask(lons, lats, point_geom):
+	"""
+	Determine which points are part of a point geometry resulting
+	from an OGR intersection with a multipoint
+
+	:param lons:
+		1-D float array, longitudes (in degrees)
+	:param lats:
+		1-D float array, latitudes (in degrees)
+	:param point_geom:
+		instance of :class:`ogr.Geometry`, point, multipoint or
+		geometry collection of points (or None)
+
+	:return:
+		1-D bool array
+	"""
+	from osgeo import ogr
+
+	if point_geom is None or point_geom.IsEmpty():
+		return np.zeros(len(lons), dtype=bool)
+
+	point_geom.FlattenTo2D()
+	geom_type = ogr.GT_Flatten(point_geom.GetGeometryType())
+	if geom_type == ogr.wkbPoint:
+		hit_lons, hit_lats = [point_geom.GetX(0)], [point_geom.GetY(0)]
+	elif geom_type == ogr.wkbMultiPoint:
+		hit_points = np.frombuffer(bytes(point_geom.ExportToWkb(ogr.wkbNDR)),
+									dtype=_WKB_POINT_DTYPE, offset=9)
+		hit_lons, hit_lats = hit_points['x'], hit_points['y']
+	else:
+		hit_lons, hit_lats = [], []
+		for i in range(point_geom.GetGeometryCount()):
+			pt = point_geom.GetGeometryRef(i)
+			if ogr.GT_Flatten(pt.GetGeometryType()) == ogr.wkbPoint:
+				hit_lons.append(pt.GetX(0))
+				hit_lats.append(pt.GetY(0))
+
+	## Intersection does not alter point coordinates, so points can be
+	## matched exactly (coordinates are combined in complex numbers)
+	return np.isin(lons + 1j * lats, np.asarray(hit_lons) + 1j * np.asarray(hit_lats))
+
+
+def _get_ogr_polygon_mask(lons, lats, poly_obj):
+	"""
+	Determine which points are situated inside a polygon with OGR,
+	by intersecting the polygon with a multipoint containing all points.
+	As with :meth:`ogr.Geometry.Within`, points on the polygon boundary
+	are considered outside
+
+	:param lons:
+		1-D float array, longitudes (in degrees)
+	:param lats:
+		1-D float array, latitudes (in degrees)
+	:param poly_obj:
+		instance of :class:`ogr.Geometry`, polygon or multipolygon
+
+	:return:
+		1-D bool array
+	"""
+	from osgeo import ogr
+
+	multipoint = ogr.CreateGeometryFromWkb(_get_multipoint_wkb(lons, lats))
+	hit = poly_obj.Intersection(multipoint)
+	mask = _get_point_geometry_mask(lons, lats, hit)
+	if not mask.any():
+		return mask
+
+	## Intersection includes points on the boundary, which are removed
+	## (only points in the intersection need to be tested)
+	on_boundary = poly_obj.GetBoundary().Intersection(hit)
+	mask &= ~_get_point_geometry_mask(lons, lats, on_boundary)
+
+	return mask
+
+
+def _get_polygon_mask(longitudes, latitudes, poly_obj, point_index=None):
+	"""
+	Determine which points are situated inside a polygon.
+	Uses vectorized containment test in shapely if available, otherwise
+	compiled crossing-number test for polygons without holes if numba
+	is available, otherwise OGR.
+	Note that points on the polygon boundary are considered outside
+	by shapely and OGR
+
+	:param longitudes:
+		array-like, longitudes (in degrees)
+	:param latitudes:
+		array-like, latitudes (in degrees)
+	:param poly_obj:
+		instance of :class:`ogr.Geometry`, polygon or multipolygon
+	:param point_index:
+		instance of :class:`rtree.index.Index`, spatial index of points
+		(default: None)
+
+	:return:
+		1-D bool array
+	"""
+	from osgeo import ogr
+
+	lons = np.ascontiguousarray(longitudes, dtype=np.float64)
+	lats = np.ascontiguousarray(latitudes, dtype=np.float64)
+	mask = np.zeros(len(lons), dtype=bool)
+
+	## Only points inside bounding box of polygon need exact test
+	minx, maxx, miny, maxy = poly_obj.GetEnvelope()
+	if point_index is not None:
+		cand_idxs = np.fromiter(point_index.intersection((minx, miny, maxx, maxy)),
+								dtype=np.intp)
+		cand_idxs.sort()
+	else:
+		cand_idxs = np.flatnonzero((lons >= minx) & (lons <= maxx)
+									& (lats >= miny) & (lats <= maxy))
+	if not len(cand_idxs):
+		return mask
+	lons, lats = lons[cand_idxs], lats[cand_idxs]
+
+	## Points farther from the centroid than the farthest polygon vertex
+	## are outside as well
+	hull = poly_obj.ConvexHull()
+	if ogr.GT_Flatten(hull.GetGeometryType()) == ogr.wkbPolygon:
+		cx, cy = poly_obj.Centroid().GetPoint_2D()
+		vertices = np.array(hull.GetGeometryRef(0).GetPoints(), dtype=np.float64)
+		r2 = ((vertices[:,0] - cx)**2 + (vertices[:,1] - cy)**2).max()
+		in_circle = ((lons - cx)**2 + (lats - cy)**2) <= r2
+		cand_idxs = cand_idxs[in_circle]
+		if not len(cand_idxs):
+			return mask
+		lons, lats = lons[in_circle], lats[in_circle]
+
+	try:
+		from shapely import wkb
+		try:
+			## Shapely >= 2.0
+			from shapely import contains_xy, prepare
+		except ImportError:
+			## Note: shapely.vectorized prepares geometry internally
+			from shapely.vectorized import contains as contains_xy
+			prepare = None
+	except ImportError:
+		if (ogr.GT_Flatten(poly_obj.GetGeometryType()) == ogr.wkbPolygon
+			and poly_obj.GetGeometryCount() == 1 and _get_numba()):
+			ring = np.array(poly_obj.GetGeometryRef(0).GetPoints(), dtype=np.float64)
+			rx = np.ascontiguousarray(ring[:,0])
+			ry = np.ascontiguousarray(ring[:,1])
+			mask[cand_idxs] = _pip_mask(lons, lats, rx, ry)
+		else:
+			mask[cand_idxs] = _get_ogr_polygon_mask(lons, lats, poly_obj)
+	else:
+		poly_geom = wkb.loads(bytes(poly_obj.ExportToWkb()))
+		## Prepared geometry builds spatial index of polygon edges
+		if prepare:
+			prepare(poly_geom)
+		mask[cand_idxs] = contains_xy(poly_geom, lons, lats)
+
+	return mask
+
+
+def filter_points_by_polygon(longitudes, latitudes, poly_obj, point_index=None):
 	"""
 	Subselect points from a point collection that are situated
 	inside a polygon
@@ -23,11 +297,19 @@ def filter_points_by_polygon(longitudes, latitudes, poly_obj):
 	:param poly_obj:
 		polygon or closed linestring object (ogr geometry object
 		or oqhazlib.geo.polygon.Polygon object)
+	:param point_index:
+		instance of :class:`rtree.index.Index`, spatial index of the points,
+		see :func:`build_point_index`. Recommended if the same points
+		need to be filtered by many polygons (not used for oqhazlib
+		polygons)
+		(default: None)
 
 	:return:
 		(points_inside, points_outside) tuple
 		lists with indexes of points that are inside/outside the polygon
 	"""
+	from osgeo import ogr
+
 	points_inside, points_outside = [], []
 
 	## First try converting poly_obj to ogr geometry if this is supported
@@ -37,32 +319,26 @@ def filter_points_by_polygon(longitudes, latitudes, poly_obj):
 		poly_obj = poly_obj.to_ogr_geometry()
 
 	if isinstance(poly_obj, ogr.Geometry):
-		## Construct WGS84 projection system corresponding to earthquake coordinates
-		from .coordtrans import WGS84
-
-		## Point object that will be used to test if earthquake is inside zone
-		point = ogr.Geometry(ogr.wkbPoint)
-		point.AssignSpatialReference(WGS84)
-
-		if poly_obj.GetGeometryName() in ("MULTIPOLYGON", "POLYGON", "LINESTRING"):
+		## Note: GT_Flatten strips 2.5D/Z flags from geometry type
+		geom_type = ogr.GT_Flatten(poly_obj.GetGeometryType())
+		if geom_type in (ogr.wkbMultiPolygon, ogr.wkbPolygon, ogr.wkbLineString):
 			## Objects other than polygons or closed polylines will be skipped
-			if poly_obj.GetGeometryName() == "LINESTRING":
+			if geom_type == ogr.wkbLineString:
 				line_obj = poly_obj
 				if line_obj.IsRing() and line_obj.GetPointCount() > 3:
-					## Note: Could not find a way to convert linestrings to polygons
-					## The following only works for linearrings (what is the difference??)
-					#poly_obj = ogr.Geometry(ogr.wkbPolygon)
-					#poly_obj.AddGeometry(line_obj)
-					wkt = line_obj.ExportToWkt().replace("LINESTRING (", "POLYGON ((") + ")"
-					poly_obj = ogr.CreateGeometryFromWkt(wkt)
+					## Note: AddGeometry only accepts linearrings, not linestrings
+					## ForceToPolygon converts closed linestrings directly
+					## (without WKT round trip), and does not modify line_obj
+					poly_obj = ogr.ForceToPolygon(line_obj)
+					if ogr.GT_Flatten(poly_obj.GetGeometryType()) != ogr.wkbPolygon:
+						wkt = line_obj.ExportToWkt().replace("LINESTRING (", "POLYGON ((") + ")"
+						poly_obj = ogr.CreateGeometryFromWkt(wkt)
 				else:
 					return None
-			for idx, (lon, lat) in enumerate(zip(longitudes, latitudes)):
-				point.SetPoint(0, lon, lat)
-				if point.Within(poly_obj):
-					points_inside.append(idx)
-				else:
-					points_outside.append(idx)
+			mask = _get_polygon_mask(longitudes, latitudes, poly_obj,
+									point_index=point_index)
+			points_inside = np.flatnonzero(mask).tolist()
+			points_outside = np.flatnonzero(~mask).tolist()
 
 		else:
 			msg = 'Warning: %s not a polygon geometry!'
@@ -72,15 +348,113 @@ def filter_points_by_polygon(longitudes, latitudes, poly_obj):
 	else:
 		import openquake.hazardlib as oqhazlib
 		if isinstance(poly_obj, oqhazlib.geo.Polygon):
-			mesh = oqhazlib.geo.Mesh(longitudes, latitudes, depths=None)
-			intersects = poly_obj.intersects(mesh)
-			in_polygon = (intersects == True)
-			for idx in range(len(in_polygon)):
-				if in_polygon[idx]:
-					points_inside.append(idx)
-				else:
-					points_outside.append(idx)
+			## Only points inside bounding box of polygon need exact test
+			## (except for polygons that may cross the international date line)
+			lons = np.asarray(longitudes, dtype=np.float64)
+			lats = np.asarray(latitudes, dtype=np.float64)
+			minx, maxx = poly_obj.lons.min(), poly_obj.lons.max()
+			miny, maxy = poly_obj.lats.min(), poly_obj.lats.max()
+			if maxx - minx <= 180:
+				cand = ((lons >= minx) & (lons <= maxx)
+						& (lats >= miny) & (lats <= maxy))
+			else:
+				cand = np.ones(len(lons), dtype=bool)
+			in_polygon = np.zeros(len(lons), dtype=bool)
+			if cand.any():
+				mesh = oqhazlib.geo.Mesh(lons[cand], lats[cand], depths=None)
+				intersects = poly_obj.intersects(mesh)
+				in_polygon[cand] = (intersects == True)
+			points_inside = np.flatnonzero(in_polygon).tolist()
+			points_outside = np.flatnonzero(~in_polygon).tolist()
 		else:
 			raise Exception("poly_obj not recognized!")
 
 	return points_inside, points_outside
+
+
+def filter_collection_by_polygon(pt_collection, poly_obj, as_indexes=False,
+								point_index=None):
+	"""
+	Subselect points from a point collection that are situated
+	inside a polygon
+
+	:param pt_collection:
+		iterable point collection (e.g., earthquake catalog), must have
+		:meth:`get_longitudes` and :meth:`get_latitudes` methods
+	:param poly_obj:
+		polygon or closed linestring object (ogr geometry object
+		or oqhazlib.geo.polygon.Polygon object)
+	:param as_indexes:
+		bool, whether to return indexes rather than points
+		(default: False)
+	:param point_index:
+		instance of :class:`rtree.index.Index`, spatial index of the points,
+		see :func:`filter_points_by_polygon`
+		(default: None)
+
+	:return:
+		(points_inside, points_outside) tuple
+		lists with points (or indexes) that are inside/outside the polygon
+	"""
+	result = filter_points_by_polygon(pt_collection.get_longitudes(),
+								pt_collection.get_latitudes(), poly_obj,
+								point_index=point_index)
+	if result is None or as_indexes:
+		return result
+
+	## Convert collection to list once, rather than indexing it per point
+	idxs_inside, idxs_outside = result
+	items = list(pt_collection)
+	points_inside = [items[idx] for idx in idxs_inside]
+	points_outside = [items[idx] for idx in idxs_outside]
+
+	return points_inside, points_outside
+
+
+def locate_points_in_polygons(longitudes, latitudes, poly_objs):
+	"""
+	Determine for each point in which polygon of a collection it is
+	situated. The points are put in an STR-tree spatial index, which is
+	queried with each (prepared) polygon, so that each polygon is only
+	tested against the points inside its bounding box.
+	Requires shapely >= 2.0
+
+	:param longitudes:
+		array-like, longitudes (in degrees)
+	:param latitudes:
+		array-like, latitudes (in degrees)
+	:param poly_objs:
+		list with instances of :class:`ogr.Geometry` or shapely geometries,
+		polygons or multipolygons (e.g., 'obj' values of records read with
+		:func:`read_gis.read_gis_file`)
+
+	:return:
+		1-D int array, index of polygon containing each point,
+		-1 for points outside all polygons (including points on
+		polygon boundaries). If polygons overlap, the lowest index
+		is returned
+	"""
+	from shapely import STRtree, from_wkb, points
+
+	polys = [bytes(poly_obj.ExportToWkb()) if hasattr(poly_obj, 'ExportToWkb')
+			else poly_obj for poly_obj in poly_objs]
+	polys = [from_wkb(poly) if isinstance(poly, bytes) else poly for poly in polys]
+
+	pts = points(np.asarray(longitudes, dtype=np.float64),
+				np.asarray(latitudes, dtype=np.float64))
+	if not len(pts) or not len(polys):
+		return np.full(len(pts), -1, dtype=np.intp)
+
+	## Note: shapely prepares the query geometries (polygons),
+	## not the geometries in the tree
+	point_index = STRtree(pts)
+	poly_idxs, pt_idxs = point_index.query(polys, predicate='contains_properly')
+
+	## Keep lowest polygon index for each point, starting from number
+	## of polygons as sentinel for points outside all polygons
+	## (unbuffered, as the same point may be contained in several polygons)
+	num_polys = len(polys)
+	poly_nums = np.full(len(pts), num_polys, dtype=np.intp)
+	np.minimum.at(poly_nums, pt_idxs, poly_idxs.astype(np.intp))
+	poly_nums[poly_nums == num_polys] = -1
+	return poly_nums
@@ -14,13 +14,27 @@ except:
 
 
 import os
+import re
+import gzip
+import codecs
+import hashlib
+import pickle
+import uuid
 from collections import OrderedDict
 import numpy as np
 import ogr, osr
 
-from .coordtrans import WGS84, LAMBERT1972
+from .coordtrans import (WGS84, LAMBERT1972, get_coordinate_transformation,
+						get_pyproj_transformer)
 
 
+## Datums in WKT of older MapInfo implementations of Lambert1972
+_MI_LAMBERT_RE = re.compile(r'DATUM\["(?:Belgium_Hayford|MIF 999|MIF 110)')
+
+## Python codecs whose (upper-case) name is also known to GDAL/iconv
+_GDAL_CODEC_NAMES = ('utf-8', 'ascii', 'big5', 'gbk', 'gb2312', 'euc-jp',
+					'shift_jis', 'koi8-r', 'koi8-u')
+
 
 def get_available_formats():
 	"""
@@ -37,53 +51,462 @@ def get_available_formats():
 	return sorted(gis_formats)
 
 
-def read_gis_file(GIS_filespec, layer_num=0, out_srs=WGS84, encoding="guess",
-				attribute_filter="", fix_mi_lambert=True, verbose=True):
+def _get_gdal_encoding(encoding):
 	"""
-	Read GIS file.
+	Convert name of Python codec to encoding name understood by GDAL
+	(which relies on iconv for recoding), e.g. 'latin-1' to 'ISO-8859-1'
+
+	:param encoding:
+		str, name of Python codec
+
+	:return:
+		str, GDAL encoding name, or None if encoding is not recognized
+	"""
+	try:
+		name = codecs.lookup(encoding).name
+	except LookupError:
+		return None
+	match = re.match(r'(iso8859-|cp)(\d+)$', name)
+	if match:
+		prefix, number = match.groups()
+		return str('%s%s' % ({'iso8859-': 'ISO-8859-', 'cp': 'CP'}[prefix], number))
+	elif name in _GDAL_CODEC_NAMES:
+		return str(name.upper())
+	else:
+		return None
+
+
+def _get_cache_filespec(GIS_filespec, *args):
+	"""
+	Determine path of cache file for a GIS file, which depends on
+	the size and modification time of the GIS file and its companion
+	files (with the same base name), and on the arguments used to read it.
+	The file name starts with a hash of the arguments only, so that
+	outdated cache files for the same arguments can be recognized
+	(see :func:`_remove_stale_caches`)
 
 	:param GIS_filespec:
-		str, full path to GIS file to read
+		str, full path to GIS file
+	:param args:
+		arguments of :func:`read_gis_file` affecting the records
+
+	:return:
+		str, full path to cache file
+	"""
+	folder, filename = os.path.split(os.path.abspath(GIS_filespec))
+	basename = os.path.splitext(filename)[0]
+	args_key = hashlib.md5(repr(args).encode('utf-8'))
+	key = args_key.copy()
+	for fn in sorted(os.listdir(folder)):
+		if os.path.splitext(fn)[0] == basename:
+			stat = os.stat(os.path.join(folder, fn))
+			key.update(repr((fn, stat.st_size, stat.st_mtime)).encode('utf-8'))
+	return '%s.%s.%s.pkl.gz' % (GIS_filespec, args_key.hexdigest()[:8],
+								key.hexdigest())
+
+
+def _remove_stale_caches(cache_filespec):
+	"""
+	Remove cache files written for the same GIS file and arguments
+	as :param:`cache_filespec`, but for an older version of the GIS file
+
+	:param cache_filespec:
+		str, full path to current cache file
+		(see :func:`_get_cache_filespec`)
+	"""
+	folder, cache_filename = os.path.split(os.path.abspath(cache_filespec))
+	## Strip hash of GIS file state and extension
+	prefix = cache_filename.rsplit('.', 3)[0] + '.'
+	for fn in os.listdir(folder):
+		if (fn != cache_filename and fn.startswith(prefix)
+			and fn.endswith('.pkl.gz')):
+			os.remove(os.path.join(folder, fn))
+
+
+def _write_cache(cache_filespec, layer_columns):
+	"""
+	Write columns of GIS records to cache file, with OGR geometries as WKB.
+	The file is written under a temporary name first, so that other
+	processes never see an incomplete cache file.
+	Outdated cache files for the same arguments are removed. Failure
+	to write the cache file (e.g., in a read-only folder) only results
+	in a warning
+
+	:param cache_filespec:
+		str, full path to cache file
+	:param layer_columns:
+		list of dicts, columns of GIS records for each layer
+		(see :func:`_read_gis_layer_columns`)
+	"""
+	cached_layers = []
+	for columns in layer_columns:
+		cached_columns = columns.copy()
+		## All geometries in a layer share the same SRS,
+		## so it is exported only once
+		srs_wkt, axis_mapping = None, None
+		for geom in columns['obj']:
+			if isinstance(geom, ogr.Geometry):
+				srs = geom.GetSpatialReference()
+				if srs is not None:
+					srs_wkt = srs.ExportToWkt()
+					if hasattr(srs, 'GetDataAxisToSRSAxisMapping'):
+						axis_mapping = list(srs.GetDataAxisToSRSAxisMapping())
+				break
+		## Numpy coordinates can be pickled directly
+		cached_columns['obj'] = [bytes(geom.ExportToWkb())
+								if isinstance(geom, ogr.Geometry) else geom
+								for geom in columns['obj']]
+		cached_layers.append((cached_columns, srs_wkt, axis_mapping))
+
+	## Note: unique temporary name in the same folder, so that it can be
+	## renamed atomically, and concurrent writers do not interfere
+	tmp_filespec = '%s.%s.tmp' % (cache_filespec, uuid.uuid4().hex)
+	try:
+		with gzip.open(tmp_filespec, 'wb') as fd:
+			pickle.dump(cached_layers, fd, protocol=pickle.HIGHEST_PROTOCOL)
+		## Note: os.replace is not available in PY2
+		getattr(os, 'replace', os.rename)(tmp_filespec, cache_filespec)
+	except (IOError, OSError) as exc:
+		print("Warning: could not write cache file %s: %s" % (cache_filespec, exc))
+		## Do not leave incomplete cache file behind
+		try:
+			os.remove(tmp_filespec)
+		except (IOError, OSError):
+			pass
+		return
+
+	try:
+		_remove_stale_caches(cache_filespec)
+	except (IOError, OSError) as exc:
+		print("Warning: could not remove outdated cache files: %s" % exc)
+
+
+def _read_cache(cache_filespec):
+	"""
+	Read columns of GIS records from cache file
+
+	:param cache_filespec:
+		str, full path to cache file
+
+	:return:
+		list of dicts, columns of GIS records for each layer
+		(see :func:`_read_gis_layer_columns`)
+	"""
+	with gzip.open(cache_filespec, 'rb') as fd:
+		cached_layers = pickle.load(fd)
+
+	layer_columns = []
+	for columns, srs_wkt, axis_mapping in cached_layers:
+		if srs_wkt is not None:
+			srs = osr.SpatialReference()
+			srs.ImportFromWkt(srs_wkt)
+			if axis_mapping is not None and hasattr(srs, 'SetDataAxisToSRSAxisMapping'):
+				srs.SetDataAxisToSRSAxisMapping(axis_mapping)
+		else:
+			srs = None
+		geoms = columns['obj']
+		for i, geom in enumerate(geoms):
+			if isinstance(geom, bytes):
+				geom = ogr.CreateGeometryFromWkb(geom)
+				if srs is not None:
+					geom.AssignSpatialReference(srs)
+				geoms[i] = geom
+		layer_columns.append(columns)
+
+	return layer_columns
+
+
+def _get_geometry_coords(geom):
+	"""
+	Extract vertex coordinates of OGR geometry as numpy arrays
+
+	:param geom:
+		instance of :class:`ogr.Geometry`
+
+	:return:
+		2-D float array [num_vertices, num_dimensions] for points,
+		linestrings and rings, or (nested) list of such arrays
+		for polygons and multi-geometries
+	"""
+	num_parts = geom.GetGeometryCount()
+	if num_parts:
+		return [_get_geometry_coords(geom.GetGeometryRef(p))
+				for p in range(num_parts)]
+	else:
+		return np.array(geom.GetPoints() or [], dtype=np.float64)
+
+
+def _iter_coord_arrays(coords):
+	"""
+	Iterate over coordinate arrays in (nested) list
+
+	:param coords:
+		2-D float array or (nested) list of 2-D float arrays,
+		see :func:`_get_geometry_coords`
+
+	:return:
+		generator yielding 2-D float arrays
+	"""
+	if isinstance(coords, np.ndarray):
+		if len(coords):
+			yield coords
+	else:
+		for part_coords in coords:
+			for coord_array in _iter_coord_arrays(part_coords):
+				yield coord_array
+
+
+def _transform_geometry_coords(coords_list, coordTrans):
+	"""
+	Transform coordinates of many geometries in place, using a single
+	call to the coordinate transformation
+
+	:param coords_list:
+		list with coordinates of different geometries,
+		see :func:`_get_geometry_coords`
+	:param coordTrans:
+		instance of :class:`osr.CoordinateTransformation`
+		or :class:`pyproj.Transformer`
+	"""
+	coord_arrays = list(_iter_coord_arrays(coords_list))
+	if not coord_arrays:
+		return
+	xy_source = np.concatenate([ar[:,:2] for ar in coord_arrays])
+	if hasattr(coordTrans, 'TransformPoints'):
+		xy_target = np.array(coordTrans.TransformPoints(xy_source))
+	else:
+		## Vectorized pyproj transformation
+		xy_target = np.column_stack(coordTrans.transform(xy_source[:,0],
+														xy_source[:,1]))
+	i = 0
+	for ar in coord_arrays:
+		n = len(ar)
+		ar[:,:2] = xy_target[i:i+n,:2]
+		i += n
+
+
+def _transform_geometries(geoms, source_srs, target_srs, num_threads):
+	"""
+	Transform OGR geometries in place, distributing them over a pool
+	of threads. Each thread uses its own coordinate transformation
+
+	:param geoms:
+		list with instances of :class:`ogr.Geometry`
+	:param source_srs:
+		osr SpatialReference object: source coordinate system
+	:param target_srs:
+		osr SpatialReference object: target coordinate system
+	:param num_threads:
+		int, number of threads (None = number of CPUs)
+	"""
+	from concurrent.futures import ThreadPoolExecutor
+	from multiprocessing import cpu_count
+
+	num_threads = num_threads or cpu_count()
+
+	def transform_chunk(chunk):
+		coordTrans = osr.CoordinateTransformation(source_srs, target_srs)
+		for geom in chunk:
+			geom.Transform(coordTrans)
+
+	chunk_size = int(np.ceil(len(geoms) / float(num_threads)))
+	chunks = [geoms[i:i+chunk_size] for i in range(0, len(geoms), chunk_size)]
+	with ThreadPoolExecutor(max_workers=num_threads) as executor:
+		list(executor.map(transform_chunk, chunks))
+
+
+def _get_columnar_field_names(layer, field_indexes):
+	"""
+	Get names of attribute fields of a layer, if the layer can be read
+	with a columnar (Arrow) reader, i.e. if it has a single geometry
+	field and only fields for which columnar readers return the same
+	values as :meth:`ogr.Feature.GetField` (not dates, lists or booleans)
+
+	:param layer:
+		instance of :class:`ogr.Layer`
+	:param field_indexes:
+		list of ints, indexes of fields to read
+
+	:return:
+		list of str, field names, or None if layer cannot be read
+		with a columnar reader
+	"""
+	ld = layer.GetLayerDefn()
+	if ld.GetGeomFieldCount() != 1:
+		return None
+	field_names = []
+	for field_index in field_indexes:
+		fd = ld.GetFieldDefn(field_index)
+		if (not fd.GetType() in (ogr.OFTInteger, ogr.OFTInteger64, ogr.OFTReal,
+								ogr.OFTString) or fd.GetSubType() == ogr.OFSTBoolean):
+			return None
+		field_names.append(fd.GetName())
+	return field_names
+
+
+def _read_layer_pyogrio_columns(GIS_filespec, layer, layer_num, field_indexes,
+								where, encoding):
+	"""
+	Read geometries and attribute values of all features in a layer
+	at once with pyogrio, which transfers the layer as an Arrow table.
+	Requires the pyogrio and pyarrow packages
+
+	:param GIS_filespec:
+		str, full path to GIS file
+	:param layer:
+		instance of :class:`ogr.Layer`, layer opened with OGR
 	:param layer_num:
-		int, index of layer to read (default: 0)
-	:param out_srs:
-		instance of :class:`ogr.SpatialReference`
-		spatial reference system into which coordinates will be transformed
-		If None, native spatial reference system will be used
-		(default: WGS84)
+		int, index of layer
+	:param field_indexes:
+		list of ints, indexes of fields to read
+	:param where:
+		str, attribute filter (SQL WHERE clause)
 	:param encoding:
-		str, unicode encoding
-		(default: "guess", will try to guess, but this may fail)
-	:param attribute_filter:
-		str, attribute query string to be used when fetching features.
-		Only features for which the query evaluates as true will be returned.
-		The query string should be in the format of an SQL WHERE clause.
-		Note that string values in the query must be single-quoted!
+		str, encoding of string values in the GIS file,
+		or None to let pyogrio determine the encoding
 
-		Alternatively, attribute filter may be a dict, mapping field
-		names to lists of values (or a single value).
-		Note: multiple values mapped to a column name will act as logical
-		OR, multiple keys will act as logical AND operator.
-		(default: "")
-	:param fix_mi_lambert:
-		bool, whether or not to apply spatial reference system fix for
-		old MapInfo files in Lambert 1972 system
-		(default: True)
-	:param verbose:
-		bool, whether or not to print information while reading
-		GIS table (default: True)
+	:return:
+		see :func:`_read_layer_arrow_columns`, or None if pyogrio is not
+		available or fails to read the layer
+	"""
+	try:
+		from pyogrio.raw import read_arrow
+	except ImportError:
+		return None
+
+	field_names = _get_columnar_field_names(layer, field_indexes)
+	if field_names is None:
+		return None
+
+	try:
+		meta, table = read_arrow(GIS_filespec, layer=layer_num, columns=field_names,
+								where=where or None, encoding=encoding)
+		geom_column = meta.get('geometry_name') or 'wkb_geometry'
+		wkb_geoms = table.column(geom_column).to_pylist()
+		field_values = [table.column(field_name).to_pylist()
+						for field_name in field_names]
+	except Exception:
+		## Fall back to reading with OGR
+		return None
+
+	return wkb_geoms, field_values
+
+
+def _read_layer_arrow_columns(layer, field_indexes):
+	"""
+	Read geometries and attribute values of all features in a layer
+	at once, using GDAL's columnar Arrow interface (GDAL >= 3.6).
+	Note that the attribute filter of the layer is applied
+
+	:param layer:
+		instance of :class:`ogr.Layer`
+	:param field_indexes:
+		list of ints, indexes of fields to read (other fields should
+		be ignored in the layer)
 
 	:return:
-		list of dictionaries corresponding to GIS records.
-		Each record contains the following keys:
-		- 'obj': corresponding value is instance of :class:`osgeo.ogr.Geometry`
-			with all coordinates in spatial reference system in :param:`out_srs`
-		- '#': sequence number
-		- keys corresponding to data attribute names
-		Note that keys and string values are decoded into unicode
-		if :param:`encoding' is not set
+		(wkb_geoms, field_values) tuple:
+		- list with WKB geometries (None for features without geometry)
+		- list with, for each attribute field, list of values
+		or None if the Arrow interface is not available, or if the layer
+		cannot be read with a columnar reader
+		(see :func:`_get_columnar_field_names`)
 	"""
-	ds = ogr.Open(GIS_filespec, 0)
+	if not hasattr(layer, 'GetArrowStreamAsNumPy'):
+		return None
+
+	field_names = _get_columnar_field_names(layer, field_indexes)
+	if field_names is None:
+		return None
+	geom_column = layer.GetGeometryColumn() or 'wkb_geometry'
+
+	wkb_geoms = []
+	field_values = [[] for field_name in field_names]
+	stream = layer.GetArrowStreamAsNumPy(options=['INCLUDE_FID=NO'])
+	for batch in stream:
+		wkb_geoms.extend(batch[geom_column].tolist())
+		for field_name, values in zip(field_names, field_values):
+			ar = batch[field_name]
+			## Null values are masked
+			if np.ma.isMaskedArray(ar):
+				ar = ar.astype(object).filled(None)
+			values.extend(ar.tolist())
+
+	return wkb_geoms, field_values
+
+
+def _get_sql_condition(field_name, values, field_type):
+	"""
+	Construct SQL condition selecting particular values of a field.
+	A single value is compared with '=' and a contiguous range of
+	integers with BETWEEN rather than IN, as drivers can map these
+	more easily to an index lookup
+
+	:param field_name:
+		str, name of attribute field
+	:param values:
+		list of values
+	:param field_type:
+		int, OGR field type (e.g., ogr.OFTString, ogr.OFTInteger)
+
+	:return:
+		str, SQL condition
+	"""
+	if field_type == ogr.OFTString:
+		## Single quotes in string values must be doubled
+		values = ["'%s'" % ('%s' % val).replace("'", "''") for val in values]
+	elif field_type in (ogr.OFTInteger, ogr.OFTInteger64):
+		int_values = sorted(set(int(val) for val in values))
+		if (len(int_values) > 2
+			and int_values[-1] - int_values[0] == len(int_values) - 1):
+			return "%s BETWEEN %d AND %d" % (field_name, int_values[0],
+											int_values[-1])
+		values = ['%d' % val for val in int_values]
+	elif field_type == ogr.OFTReal:
+		values = ['%r' % float(val) for val in values]
+	else:
+		values = ['%s' % val for val in values]
+
+	if len(values) == 1:
+		return "%s = %s" % (field_name, values[0])
+	else:
+		return "%s in (%s)" % (field_name, ','.join(values))
+
+
+def _read_gis_layer_columns(GIS_filespec, layer_num, out_srs, encoding,
+							attribute_filter, fix_mi_lambert, verbose, geom_as,
+							num_threads, fields):
+	"""
+	Read GIS file into columns.
+	See :func:`read_gis_file` for a description of the parameters
+
+	:return:
+		list with, for each layer, ordered dict mapping column names
+		('#', 'obj' and attribute names) to lists of values
+	"""
+	## Fields used in attribute filter cannot be ignored
+	if isinstance(attribute_filter, dict):
+		filter_field_names = list(attribute_filter.keys())
+	else:
+		filter_field_names = []
+
+	## Encoding specified by user (rather than guessed)
+	file_encoding = (encoding != "guess" and encoding) or None
+	## Note: Python codec names are not always understood by GDAL
+	gdal_encoding = file_encoding and _get_gdal_encoding(file_encoding)
+	if gdal_encoding:
+		## Let GDAL recode strings in shapefiles to UTF-8 (in C)
+		import gdal
+
+		## Note: str for PY2/3 compatibility
+		prev_shape_encoding = gdal.GetConfigOption(str('SHAPE_ENCODING'))
+		gdal.SetConfigOption(str('SHAPE_ENCODING'), gdal_encoding)
+		try:
+			ds = ogr.Open(GIS_filespec, 0)
+		finally:
+			gdal.SetConfigOption(str('SHAPE_ENCODING'), prev_shape_encoding)
+	else:
+		ds = ogr.Open(GIS_filespec, 0)
 	if ds is None:
 		raise Exception("OGR failed to open %s" % GIS_filespec)
 	num_layers = ds.GetLayerCount()
@@ -95,7 +518,9 @@ def read_gis_file(GIS_filespec, layer_num=0, out_srs=WGS84, encoding="guess",
 	elif layer_num is None:
 		layer_nums = range(num_layers)
 
-	records = []
+	is_mapinfo_tab = os.path.splitext(GIS_filespec)[-1].upper() == ".TAB"
+
+	layer_columns = []
 	for layer_num in layer_nums:
 		if layer_num < num_layers:
 			layer = ds.GetLayer(layer_num)
@@ -116,6 +541,10 @@ def read_gis_file(GIS_filespec, layer_num=0, out_srs=WGS84, encoding="guess",
 			encoding = ((ogr_recoding and 'UTF-8')
 				or (is_shapefile and 'ISO-8859-1')
 				or getpreferredencoding())
+		elif encoding and layer.TestCapability(ogr.OLCStringsAsUTF8):
+			## Strings have been recoded by GDAL (only relevant for PY2,
+			## in PY3 string values are already returned as unicode)
+			encoding = 'UTF-8'
 
 		## Get all field names
 		field_names = []
@@ -124,15 +553,17 @@ def read_gis_file(GIS_filespec, layer_num=0, out_srs=WGS84, encoding="guess",
 			fd = ld.GetFieldDefn(field_index)
 			field_names.append(fd.GetName())
 
+		## Convert field names to unicode once for all features
+		if encoding:
+			field_names = [fn.decode(encoding) if isinstance(fn, bytes) else fn
+							for fn in field_names]
+
 		## Set up transformation between table coordsys and wgs84
 		tab_srs = layer.GetSpatialRef()
 
 		## Hack to fix earlier MapInfo implementation of Lambert1972
-		if fix_mi_lambert:
-			wkt = tab_srs.ExportToWkt()
-			if (os.path.splitext(GIS_filespec)[-1].upper() == ".TAB" and
-				('DATUM["Belgium_Hayford' in wkt or 'DATUM["MIF 999' in wkt
-				or 'DATUM["MIF 110' in wkt)):
+		if fix_mi_lambert and is_mapinfo_tab:
+			if _MI_LAMBERT_RE.search(tab_srs.ExportToWkt()):
 				if tab_srs.IsProjected():
 					print("Fixing older MapInfo implementation of Lambert1972...")
 					tab_srs = LAMBERT1972
@@ -143,7 +574,8 @@ def read_gis_file(GIS_filespec, layer_num=0, out_srs=WGS84, encoding="guess",
 				#tab_srs.CopyGeogCSFrom(LAMBERT1972)
 
 		if out_srs and not tab_srs.IsSame(out_srs):
-			coordTrans = osr.CoordinateTransformation(tab_srs, out_srs)
+			## Note: transformation is reused when reading files with the same SRS
+			coordTrans = get_coordinate_transformation(tab_srs, out_srs)
 		else:
 			coordTrans = None
 
@@ -156,10 +588,7 @@ def read_gis_file(GIS_filespec, layer_num=0, out_srs=WGS84, encoding="guess",
 						values = [values]
 					field_index = field_names.index(key)
 					fd = ld.GetFieldDefn(field_index)
-					if fd.GetType() == ogr.OFTString:
-						values = ["'%s'" % val for val in values]
-					q = "%s in (%s)" % (key, ','.join(values))
-					subqueries.append(q)
+					subqueries.append(_get_sql_condition(key, values, fd.GetType()))
 				attribute_filter = ' AND '.join(subqueries)
 				## Note: str for PY2/3 compatibility
 				attribute_filter = str(attribute_filter)
@@ -167,62 +596,391 @@ def read_gis_file(GIS_filespec, layer_num=0, out_srs=WGS84, encoding="guess",
 			if retval != 0:
 				print("Warning: attribute filter failed, check your syntax!")
 
-		## Loop over features in layer
-		num_features = layer.GetFeatureCount()
+		## Let OGR skip reading fields that are not needed
+		field_indexes = list(range(len(field_names)))
+		if fields is not None:
+			field_indexes = [field_index for field_index in field_indexes
+							if field_names[field_index] in fields]
+			ignored_fields = [ld.GetFieldDefn(field_index).GetName()
+							for field_index, field_name in enumerate(field_names)
+							if not (field_name in fields
+									or field_name in filter_field_names)]
+			layer.SetIgnoredFields(ignored_fields)
+			field_names = [field_names[field_index] for field_index in field_indexes]
+
+		## Only values of string fields may need to be converted to unicode
+		## Note: decoder function is looked up once rather than for each value
+		decoder = codecs.getdecoder(encoding) if encoding else None
+		field_decoders = []
+		for field_index in field_indexes:
+			is_string = ld.GetFieldDefn(field_index).GetType() == ogr.OFTString
+			field_decoders.append(decoder if is_string else None)
+
+		## Feature count is only used for information, so it is not forced
+		## (counting requires a full scan for some drivers or with a filter)
 		if verbose:
-			print("Number of features in layer %d: %d" % (layer_num, num_features))
-
-		## Note: because of attribute filter, only use GetNextFeature method
-		## or iterate over layer
-		for i, feature in enumerate(layer):
-		#for i in range(num_features):
-			feature_data = OrderedDict()
-			#feature = layer.GetNextFeature()
-
-			## Silently ignore empty rows
-			if feature:
-				feature_data['#'] = i
-				## Get geometry
-				## Note: we need to clone the geometry returned by GetGeometryRef(),
-				## otherwise python will crash
-				## See http://trac.osgeo.org/gdal/wiki/PythonGotchas
-				try:
-					geom = feature.GetGeometryRef().Clone()
-				except:
-					## Silently ignore
-					pass
+			num_features = layer.GetFeatureCount(False)
+			if num_features >= 0:
+				print("Number of features in layer %d: %d" % (layer_num, num_features))
+
+		## Store values in columns rather than in a dict for each record
+		columns = OrderedDict()
+		columns['#'] = []
+		columns['obj'] = []
+		for field_name in field_names:
+			columns[field_name] = []
+		field_values = [columns[field_name] for field_name in field_names]
+
+		## Read all features at once with pyogrio or GDAL's Arrow
+		## interface if possible
+		arrow_columns = (_read_layer_pyogrio_columns(GIS_filespec, layer, layer_num,
+									field_indexes, attribute_filter, file_encoding)
+						or _read_layer_arrow_columns(layer, field_indexes))
+		if arrow_columns is not None:
+			wkb_geoms, arrow_field_values = arrow_columns
+			for i, wkb in enumerate(wkb_geoms):
+				## Silently ignore features without (valid) geometry
+				if wkb is None:
+					continue
+				geom = ogr.CreateGeometryFromWkb(bytes(wkb))
+				if geom is None:
+					continue
+				if geom_as == 'numpy':
+					geom = _get_geometry_coords(geom)
 				else:
 					geom.AssignSpatialReference(tab_srs)
-					if coordTrans:
+					if coordTrans and num_threads == 1:
 						geom.Transform(coordTrans)
-					#geom.CloseRings()
-					feature_data['obj'] = geom
-
-					## Get feature attributes
-					for i, field_name in enumerate(field_names):
-						value = feature.GetField(i)
-						## Convert field names and string values to unicode
-						if encoding:
-							if isinstance(field_name, bytes):
-								field_name = field_name.decode(encoding)
-							if isinstance(value, bytes):
-								value = value.decode(encoding)
-						feature_data[field_name] = value
-					records.append(feature_data)
+				columns['#'].append(i)
+				columns['obj'].append(geom)
+
+			idxs = columns['#']
+			all_features = len(idxs) == len(wkb_geoms)
+			for values, arrow_values, decode in zip(field_values, arrow_field_values,
+													field_decoders):
+				if not all_features:
+					arrow_values = [arrow_values[i] for i in idxs]
+				## Convert string values to unicode
+				if decode:
+					arrow_values = [decode(val)[0] if isinstance(val, bytes)
+									else val for val in arrow_values]
+				values.extend(arrow_values)
+		else:
+			## Taking ownership of geometries avoids copying them,
+			## but not all versions of the bindings support this
+			steal_geometry = hasattr(ogr.Feature, 'StealGeometry')
+
+			field_info = list(zip(field_indexes, field_values, field_decoders))
+
+			## Note: because of attribute filter, only use GetNextFeature method
+			## or iterate over layer
+			for i, feature in enumerate(layer):
+			#for i in range(num_features):
+				#feature = layer.GetNextFeature()
+
+				## Silently ignore empty rows
+				if feature:
+					## Get geometry
+					## Note: we need to clone (or steal) the geometry returned by
+					## GetGeometryRef(), otherwise python will crash
+					## See http://trac.osgeo.org/gdal/wiki/PythonGotchas
+					try:
+						if geom_as == 'numpy':
+							geom = _get_geometry_coords(feature.GetGeometryRef())
+						elif steal_geometry:
+							geom = feature.StealGeometry()
+						else:
+							geom = feature.GetGeometryRef().Clone()
+					except:
+						## Silently ignore
+						pass
+					else:
+						if geom is None:
+							## Silently ignore features without geometry
+							continue
+						if geom_as != 'numpy':
+							geom.AssignSpatialReference(tab_srs)
+							if coordTrans and num_threads == 1:
+								geom.Transform(coordTrans)
+						#geom.CloseRings()
+						columns['#'].append(i)
+						columns['obj'].append(geom)
+
+						## Get feature attributes
+						for field_index, values, decode in field_info:
+							value = feature.GetField(field_index)
+							## Convert string values to unicode
+							if decode and isinstance(value, bytes):
+								value = decode(value)[0]
+							values.append(value)
+
+		if coordTrans and columns['obj']:
+			if geom_as == 'numpy':
+				## Coordinates are transformed at once for all features,
+				## with pyproj if available and if it uses the same axis
+				## order as OSR (see :func:`get_pyproj_transformer`)
+				transformer = get_pyproj_transformer(tab_srs, out_srs)
+				_transform_geometry_coords(columns['obj'], transformer or coordTrans)
+			elif num_threads != 1:
+				_transform_geometries(columns['obj'], tab_srs, out_srs, num_threads)
+
+		layer_columns.append(columns)
+
+	return layer_columns
+
+
+def _get_object_array(values):
+	"""
+	Convert list of values to 1-D object array, without numpy
+	interpreting sequence-like values (e.g., geometries) as extra
+	dimensions
+
+	:param values:
+		list
+
+	:return:
+		1-D object array
+	"""
+	ar = np.empty(len(values), dtype=object)
+	for i, value in enumerate(values):
+		ar[i] = value
+	return ar
+
+
+def _get_column_array(values):
+	"""
+	Convert list of column values to 1-D numeric array if possible,
+	otherwise to object array
+
+	:param values:
+		list
+
+	:return:
+		1-D array
+	"""
+	ar = np.asarray(values)
+	if ar.ndim != 1 or not ar.dtype.kind in 'biuf':
+		ar = _get_object_array(values)
+	return ar
+
+
+def _merge_layer_columns(layer_columns):
+	"""
+	Merge columns of different layers, filling in None for
+	attributes that do not exist in a layer
+
+	:param layer_columns:
+		list of dicts, columns of GIS records for each layer
+		(see :func:`_read_gis_layer_columns`)
+
+	:return:
+		ordered dict, mapping column names to lists of values
+	"""
+	if len(layer_columns) == 1:
+		return layer_columns[0]
+
+	merged_columns = OrderedDict()
+	num_rows = 0
+	for columns in layer_columns:
+		num_layer_rows = len(columns['#'])
+		for name in columns.keys():
+			if not name in merged_columns:
+				merged_columns[name] = [None] * num_rows
+		for name, values in merged_columns.items():
+			values.extend(columns.get(name, [None] * num_layer_rows))
+		num_rows += num_layer_rows
+
+	return merged_columns
+
+
+def _layer_columns_to_dict(layer_columns):
+	"""
+	Merge columns of GIS records, converting numeric columns to arrays
+
+	:param layer_columns:
+		list of dicts, columns of GIS records for each layer
+		(see :func:`_read_gis_layer_columns`)
+
+	:return:
+		ordered dict, mapping column names to 1-D numeric arrays
+		(numeric attributes) or lists (geometries and other attributes)
+	"""
+	columns = OrderedDict()
+	for name, values in _merge_layer_columns(layer_columns).items():
+		if name != 'obj':
+			ar = np.asarray(values)
+			if ar.ndim == 1 and ar.dtype.kind in 'biuf':
+				values = ar
+		columns[name] = values
+
+	return columns
+
+
+def _layer_columns_to_array(layer_columns):
+	"""
+	Convert columns of GIS records to structured array
+
+	:param layer_columns:
+		list of dicts, columns of GIS records for each layer
+		(see :func:`_read_gis_layer_columns`)
+
+	:return:
+		structured array
+	"""
+	columns = _merge_layer_columns(layer_columns)
+	arrays = OrderedDict()
+	for name, values in columns.items():
+		if name == 'obj':
+			arrays[name] = _get_object_array(values)
+		else:
+			arrays[name] = _get_column_array(values)
+
+	## Note: str for PY2/3 compatibility
+	dtype = np.dtype([(str(name), ar.dtype) for name, ar in arrays.items()])
+	records = np.empty(len(columns['#']), dtype=dtype)
+	for name, ar in arrays.items():
+		records[str(name)] = ar
+
 	return records
 
 
-def read_gis_file_attributes(GIS_filespec, layer_num=0):
+def read_gis_file(GIS_filespec, layer_num=0, out_srs=WGS84, encoding="guess",
+				attribute_filter="", fix_mi_lambert=True, verbose=True,
+				cache=False, geom_as='ogr', return_format='records',
+				num_threads=1, fields=None):
 	"""
-	Read GIS data attributes.
+	Read GIS file.
 
 	:param GIS_filespec:
 		str, full path to GIS file to read
 	:param layer_num:
 		int, index of layer to read (default: 0)
+	:param out_srs:
+		instance of :class:`ogr.SpatialReference`
+		spatial reference system into which coordinates will be transformed
+		If None, native spatial reference system will be used
+		(default: WGS84)
+	:param encoding:
+		str, unicode encoding
+		(default: "guess", will try to guess, but this may fail)
+	:param attribute_filter:
+		str, attribute query string to be used when fetching features.
+		Only features for which the query evaluates as true will be returned.
+		The query string should be in the format of an SQL WHERE clause.
+		Note that string values in the query must be single-quoted!
+
+		Alternatively, attribute filter may be a dict, mapping field
+		names to lists of values (or a single value).
+		Note: multiple values mapped to a column name will act as logical
+		OR, multiple keys will act as logical AND operator.
+		(default: "")
+	:param fix_mi_lambert:
+		bool, whether or not to apply spatial reference system fix for
+		old MapInfo files in Lambert 1972 system
+		(default: True)
+	:param verbose:
+		bool, whether or not to print information while reading
+		GIS table (default: True)
+	:param cache:
+		bool, whether or not to store records in a compressed pickle
+		file next to the GIS file, to be reused by subsequent calls with
+		the same arguments. The cache file is ignored if the GIS file
+		(or any of its companion files) has been modified, and is then
+		replaced (together with other outdated cache files for the same
+		arguments). Cache files for other arguments are kept, and may be
+		deleted manually (GIS file name + '.*.pkl.gz'). If the cache file
+		cannot be written or read, a warning is printed
+		(default: False)
+	:param geom_as:
+		str, how geometries should be returned: 'ogr' (OGR geometry
+		objects) or 'numpy' (vertex coordinates, for callers that do not
+		need OGR objects; avoids cloning geometries, and all coordinates
+		of a layer are transformed at once)
+		(default: 'ogr')
+	:param return_format:
+		str, format of returned records: 'records' (list of dicts),
+		'array' (numpy structured array, with numeric fields for numeric
+		attributes and object fields for geometries and other attributes)
+		or 'columns' (dict mapping keys to numeric arrays for numeric
+		attributes and to lists for geometries and other attributes)
+		(default: 'records')
+	:param num_threads:
+		int, number of threads used to transform OGR geometries to
+		:param:`out_srs`, may speed up reading large files.
+		If None, the number of CPUs will be used
+		(default: 1)
+	:param fields:
+		list of str, names of attribute fields to read. Other fields
+		are not read by OGR, which is faster for files with many fields.
+		Note that fields used in a string :param:`attribute_filter`
+		must be included. If None, all fields will be read
+		(default: None)
 
 	:return:
-		list of strings, attribute names.
+		list of dictionaries corresponding to GIS records
+		(or structured array if :param:`return_format` is 'array',
+		or dict of columns if :param:`return_format` is 'columns').
+		Each record contains the following keys:
+		- 'obj': corresponding value is instance of :class:`osgeo.ogr.Geometry`
+			with all coordinates in spatial reference system in :param:`out_srs`
+			or, if :param:`geom_as` is 'numpy', 2-D [num_vertices, num_dims]
+			array of coordinates (or nested list of such arrays for polygons
+			and multi-geometries), see :func:`_get_geometry_coords`
+		- '#': sequence number
+		- keys corresponding to data attribute names
+		Note that keys and string values are decoded into unicode
+		if :param:`encoding' is not set
+	"""
+	layer_columns = None
+	if cache:
+		if isinstance(attribute_filter, dict):
+			filter_key = sorted(attribute_filter.items())
+		else:
+			filter_key = attribute_filter
+		srs_key = out_srs.ExportToWkt() if out_srs else None
+		cache_filespec = _get_cache_filespec(GIS_filespec, layer_num, srs_key,
+								encoding, filter_key, fix_mi_lambert, geom_as, fields)
+		if os.path.exists(cache_filespec):
+			if verbose:
+				print("Reading cached records from %s" % cache_filespec)
+			try:
+				layer_columns = _read_cache(cache_filespec)
+			except Exception as exc:
+				## Unreadable cache file is replaced below
+				print("Warning: could not read cache file %s: %s"
+						% (cache_filespec, exc))
+
+	if layer_columns is None:
+		layer_columns = _read_gis_layer_columns(GIS_filespec, layer_num, out_srs,
+						encoding, attribute_filter, fix_mi_lambert, verbose, geom_as,
+						num_threads, fields)
+		if cache:
+			_write_cache(cache_filespec, layer_columns)
+
+	if return_format == 'array':
+		return _layer_columns_to_array(layer_columns)
+	elif return_format == 'columns':
+		return _layer_columns_to_dict(layer_columns)
+	else:
+		records = []
+		for columns in layer_columns:
+			keys = list(columns.keys())
+			records.extend(OrderedDict(zip(keys, row)) for row in zip(*columns.values()))
+		return records
+
+
+def _open_gis_layer(GIS_filespec, layer_num):
+	"""
+	Open layer of GIS file with OGR
+
+	:param GIS_filespec:
+		str, full path to GIS file to read
+	:param layer_num:
+		int, index of layer to read
+
+	:return:
+		(ds, layer) tuple: OGR datasource and layer
+		Note that the datasource must be kept as long as the layer is used
 	"""
 	ds = ogr.Open(GIS_filespec, 0)
 	if ds is None:
@@ -234,7 +992,19 @@ def read_gis_file_attributes(GIS_filespec, layer_num=0):
 	else:
 		raise Exception("File contains less than %d layers!" % layer_num)
 
-	## Get all field names
+	return ds, layer
+
+
+def _get_layer_field_names(layer):
+	"""
+	Get names of attribute fields of OGR layer
+
+	:param layer:
+		instance of :class:`ogr.Layer`
+
+	:return:
+		list of strings, attribute names
+	"""
 	field_names = []
 	ld = layer.GetLayerDefn()
 	for field_index in range(ld.GetFieldCount()):
@@ -244,37 +1014,32 @@ def read_gis_file_attributes(GIS_filespec, layer_num=0):
 	return field_names
 
 
-def read_gis_file_shapes(GIS_filespec, layer_num=0):
+def _get_layer_shapes(layer):
 	"""
-	Read GIS shapes.
+	Determine shapes in OGR layer
 
-	:param GIS_filespec:
-		str, full path to GIS file to read
-	:param layer_num:
-		int, index of layer to read (default: 0)
+	:param layer:
+		instance of :class:`ogr.Layer`
 
 	:return:
-		list of strings, GIS shapes.
+		list of strings, GIS shapes ("points", "polylines", "polygons")
 	"""
-	ds = ogr.Open(GIS_filespec, 0)
-	if ds is None:
-		raise Exception("OGR failed to open %s" % GIS_filespec)
-	num_layers = ds.GetLayerCount()
-
-	if layer_num < num_layers:
-		layer = ds.GetLayer(layer_num)
-	else:
-		raise Exception("File contains less than %d layers!" % layer_num)
+	## Only geometries are needed
+	ld = layer.GetLayerDefn()
+	layer.SetIgnoredFields([ld.GetFieldDefn(field_index).GetName()
+							for field_index in range(ld.GetFieldCount())])
 
-	num_features = layer.GetFeatureCount()
+	all_shapes = set(["points", "polylines", "polygons"])
 	shapes = set()
-	for i in range(num_features):
-		feature = layer.GetNextFeature()
-
+	for feature in layer:
 		## Silently ignore empty rows
 		if feature:
 			## Get geometry
-			geom = feature.GetGeometryRef().Clone()
+			## Note: no need to clone geometry, as it is only inspected
+			## while the feature exists
+			geom = feature.GetGeometryRef()
+			if geom is None:
+				continue
 			geom_type = geom.GetGeometryName()
 			if geom_type in ("POINT", "MULTIPOINT"):
 				shapes.add("points")
@@ -282,10 +1047,68 @@ def read_gis_file_shapes(GIS_filespec, layer_num=0):
 				shapes.add("polylines")
 			elif geom_type in ("POLYGON", "MULTIPOLYGON"):
 				shapes.add("polygons")
+			## No need to look further once all shapes have been found
+			if shapes == all_shapes:
+				break
 
 	return list(shapes)
 
 
+def inspect_gis_file(GIS_filespec, layer_num=0):
+	"""
+	Read GIS data attributes, shapes and SRS at once, opening the
+	GIS file only once.
+
+	:param GIS_filespec:
+		str, full path to GIS file to read
+	:param layer_num:
+		int, index of layer to read (default: 0)
+
+	:return:
+		(field_names, shapes, srs) tuple, see
+		:func:`read_gis_file_attributes`, :func:`read_gis_file_shapes`
+		and :func:`read_gis_file_srs`
+	"""
+	ds, layer = _open_gis_layer(GIS_filespec, layer_num)
+	field_names = _get_layer_field_names(layer)
+	shapes = _get_layer_shapes(layer)
+	srs = layer.GetSpatialRef()
+
+	return field_names, shapes, srs
+
+
+def read_gis_file_attributes(GIS_filespec, layer_num=0):
+	"""
+	Read GIS data attributes.
+
+	:param GIS_filespec:
+		str, full path to GIS file to read
+	:param layer_num:
+		int, index of layer to read (default: 0)
+
+	:return:
+		list of strings, attribute names.
+	"""
+	ds, layer = _open_gis_layer(GIS_filespec, layer_num)
+	return _get_layer_field_names(layer)
+
+
+def read_gis_file_shapes(GIS_filespec, layer_num=0):
+	"""
+	Read GIS shapes.
+
+	:param GIS_filespec:
+		str, full path to GIS file to read
+	:param layer_num:
+		int, index of layer to read (default: 0)
+
+	:return:
+		list of strings, GIS shapes.
+	"""
+	ds, layer = _open_gis_layer(GIS_filespec, layer_num)
+	return _get_layer_shapes(layer)
+
+
 def read_gis_file_srs(GIS_filespec, layer_num=0):
 	"""
 	Read GIS SRS.
@@ -298,14 +1121,5 @@ def read_gis_file_srs(GIS_filespec, layer_num=0):
 	:return:
 		instance of :class:`ogr.SpatialReference`
 	"""
-	ds = ogr.Open(GIS_filespec, 0)
-	if ds is None:
-		raise Exception("OGR failed to open %s" % GIS_filespec)
-	num_layers = ds.GetLayerCount()
-
-	if layer_num < num_layers:
-		layer = ds.GetLayer(layer_num)
-	else:
-		raise Exception("File contains less than %d layers!" % layer_num)
-
+	ds, layer = _open_gis_layer(GIS_filespec, layer_num)
 	return layer.GetSpatialRef()